@@ -0,0 +1,124 @@
+"""
+Syntax Highlighting Editor - RE2 Consistency Check
+
+Checks that the tokenizers give the same tokens whether their regexes are
+compiled with RE2 or with re; it does not compare their speed.
+Run with: python check_re2.py
+"""
+import importlib
+import os
+import sys
+
+# Sample documents covering each tokenizer's token types and multi-line states.
+# They are ASCII only: RE2's \b, \w and \s don't match non-ASCII characters
+# (see the README), so non-ASCII text is expected to tokenize differently
+SAMPLES = {
+    "python": '''import os
+from collections import defaultdict
+
+@dataclass
+class Point(Base):
+    """A point.
+    Spans "several" lines, with 'quotes' inside
+    """
+    x = 1.5  # a comment with "quotes"
+    y = 42
+
+    def distance(self, other=None):
+        if other is None and not self.x:
+            return 0
+        s = 'it\\'s' + "a \\"b\\"" + r'\\d+'
+        return (self.x ** 2 + self.y ** 2) ** 0.5 >= 1
+
+print(Point().distance(), len("unterminated)
+x = """open
+''',
+    "javascript": '''// line comment
+/* block comment */
+const greet = (name) => `Hello ${name.toUpperCase()} and ${count + 1}!`;
+let total = 3.14 * count + 0;
+function add(a, b) { return a + b; }
+class Widget extends Base {
+    constructor() { super(); this.items = ["a", 'b\\'c']; }
+}
+if (x !== null && y >= 2) { console.log(add(1, 2)); }
+const multi = `first line
+second ${value} line`;
+''',
+    "html": '''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <!-- a comment -->
+    <title>Sample &amp; page</title>
+    <link rel="stylesheet" href='style.css'>
+</head>
+<body class="main" data-id=42>
+    <p>Text with a stray > and <b>bold</b> text</p>
+    <!-- multi-line
+         comment -->
+    <img src="a.png" alt="An image"/>
+</body>
+</html>
+''',
+    "css": '''/* header styles */
+body, h1 > p.intro ~ a[href] {
+    color: #ff1493;
+    margin: 0 auto;
+    font-family: "Courier New", monospace;
+}
+.box:hover { padding: 10px 2em; }
+/* multi-line
+   comment */
+@media screen and (max-width: 600px) {
+    .box { display: none; }
+}
+''',
+}
+
+
+def tokenize_samples(use_re2):
+    """Tokenize every sample with a freshly imported tokenizer module"""
+    # The tokenizer classes compile their regexes at import, so reload the
+    # module with the flag set in the environment
+    os.environ["SYNTAX_EDITOR_RE2"] = "1" if use_re2 else "0"
+    import tokenizer
+    tokenizer = importlib.reload(tokenizer)
+
+    tokenizers = {
+        "python": tokenizer.PythonTokenizer(),
+        "javascript": tokenizer.JavaScriptTokenizer(),
+        "html": tokenizer.HTMLTokenizer(),
+        "css": tokenizer.CSSTokenizer(),
+    }
+    return tokenizer, {language: tokenizers[language].tokenize(text) for language, text in SAMPLES.items()}
+
+
+def main():
+    tokenizer, re2_tokens = tokenize_samples(use_re2=True)
+    if tokenizer.re2 is None:
+        print("google-re2 is not installed; nothing to check")
+        return 0
+
+    _, re_tokens = tokenize_samples(use_re2=False)
+
+    failed = False
+    for language in SAMPLES:
+        if re2_tokens[language] == re_tokens[language]:
+            print(f"{language}: identical")
+            continue
+
+        # Report the first token where the two differ
+        failed = True
+        pairs = zip(re2_tokens[language], re_tokens[language])
+        index = next((i for i, (a, b) in enumerate(pairs) if a != b), None)
+        if index is None:
+            index = min(len(re2_tokens[language]), len(re_tokens[language]))
+        print(f"{language}: differs at token {index}")
+        print(f"    re2: {re2_tokens[language][index:index + 3]}")
+        print(f"    re:  {re_tokens[language][index:index + 3]}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,28 @@
 Syntax Highlighting Editor - Editor Component
 """
 import tkinter as tk
-from tkinter import font, scrolledtext
-import re
+from tkinter import font
 from highlighter import SyntaxHighlighter
 
+# Lines below the viewport that are highlighted ahead of scrolling
+VIEWPORT_MARGIN = 20
+
+# Tcl proxy for a text widget's command. It forwards every command to the
+# renamed widget, so errors reach Tk's own catch without passing through Python,
+# and reports the start line and line counts before/after each successful edit
+TEXT_PROXY_PROC = """
+proc ::syntax_editor_text_proxy {widget callback command args} {
+    if {$command ni {insert delete replace} || ![llength $args]} {
+        return [$widget $command {*}$args]
+    }
+    set start_line [lindex [split [$widget index [lindex $args 0]] .] 0]
+    set lines_before [lindex [split [$widget index end-1c] .] 0]
+    set result [$widget $command {*}$args]
+    $callback $start_line $lines_before [lindex [split [$widget index end-1c] .] 0]
+    return $result
+}
+"""
+
 class LineNumbers(tk.Canvas):
     """Canvas widget for displaying line numbers"""
     def __init__(self, parent, text_widget, **kwargs):
@@ -14,35 +32,39 @@ class LineNumbers(tk.Canvas):
         self.text_font = font.Font(font=text_widget['font'])
         self.config(width=30)
         
-        # Bind events to update line numbers
-        self.text_widget.bind('<KeyPress>', self.redraw)
-        self.text_widget.bind('<KeyRelease>', self.redraw)
-        self.text_widget.bind('<MouseWheel>', self.redraw)
-        self.text_widget.bind('<Configure>', self.redraw)
-        self.text_widget.bind('<<Change>>', self.redraw)
-        self.text_widget.bind('<FocusIn>', self.redraw)
+        # Redraw after edits and resizes; scrolling is forwarded by the editor's
+        # yscrollcommand. add="+" keeps the editor's own bindings intact
+        self._redraw_after_id = None
+        self.text_widget.bind('<<Modified>>', self.schedule_redraw, add="+")
+        self.text_widget.bind('<Configure>', self.schedule_redraw, add="+")
+    
+    def schedule_redraw(self, *args):
+        """Redraw the line numbers once, after a burst of events has been handled"""
+        if self._redraw_after_id:
+            self.after_cancel(self._redraw_after_id)
+        self._redraw_after_id = self.after_idle(self.redraw)
     
     def redraw(self, *args):
         
         """Redraw the line numbers"""
+        self._redraw_after_id = None
         self.delete("all")
         
         # Get visible range of text
-        i = self.text_widget.index("@0,0")
-        while True:
-            dline = self.text_widget.dlineinfo(i)
-            if dline is None:
-                break
-            
-            # Get the line number
-            line_num = str(i).split('.')[0]
-            
-            # Draw the line number
-            x = 2
-            y = dline[1]
-            self.create_text(x, y, anchor="nw", text=line_num, font=self.text_font, fill="#9D00FF")
-            
-            i = self.text_widget.index(f"{i}+1line")
+        first_index = self.text_widget.index("@0,0")
+        dline = self.text_widget.dlineinfo(first_index)
+        if dline is None:
+            return
+        
+        first_line = int(first_index.split(".")[0])
+        last_line = int(self.text_widget.index(f"@0,{self.text_widget.winfo_height()}").split(".")[0])
+        
+        # Draw all the line numbers as a single text item; lines have the same
+        # height as in the text widget since wrapping is off and fonts match
+        line_nums = "\n".join(str(line_num) for line_num in range(first_line, last_line + 1))
+        x = 2
+        y = dline[1]
+        self.create_text(x, y, anchor="nw", text=line_nums, font=self.text_font, fill="#9D00FF")
 
 
 class SyntaxEditor(tk.Frame):
@@ -57,8 +79,9 @@ class SyntaxEditor(tk.Frame):
         self.editor_frame = tk.Frame(self)
         self.editor_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Create the text widget
-        self.text = scrolledtext.ScrolledText(
+        # Create the text widget; its scrollbar is managed here so that
+        # yscrollcommand can also drive line numbers and highlighting
+        self.text = tk.Text(
             self.editor_frame,
             wrap=tk.NONE,
             font=self.text_font,
@@ -78,7 +101,9 @@ class SyntaxEditor(tk.Frame):
         self.line_numbers = LineNumbers(self.editor_frame, self.text, bg="#e8e8f0")
         self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
         
-        # Pack the text widget
+        # Pack the vertical scrollbar and the text widget
+        self.y_scrollbar = tk.Scrollbar(self.editor_frame, orient=tk.VERTICAL, command=self.text.yview)
+        self.y_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.text.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
         
         # Configure horizontal scrolling
@@ -86,6 +111,10 @@ class SyntaxEditor(tk.Frame):
         self.x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.text.config(xscrollcommand=self.x_scrollbar.set)
         
+        # Highlight lines as they scroll into view
+        self._viewport_after_id = None
+        self.text.config(yscrollcommand=self._on_yscroll)
+        
         # Create status bar
         self.status_bar = tk.Label(
             self, 
@@ -104,7 +133,22 @@ class SyntaxEditor(tk.Frame):
         
         # Track modification state
         self._modified = False
-        self.text.bind("<<Modified>>", self._on_modified)
+        self._highlight_after_id = None
+        self.text.bind("<<Modified>>", self._on_modified, add="+")
+        
+        # Track the range of lines touched since the last highlight
+        self._dirty_start_line = None
+        self._dirty_end_line = None
+        
+        # Route the text widget's Tcl command through a proxy so that every
+        # insert/delete (typing, paste, undo) can record the lines it touched
+        self._text_cmd = self.text._w + "_orig"
+        self.tk.call("rename", self.text._w, self._text_cmd)
+        self.tk.eval(TEXT_PROXY_PROC)
+        self.tk.call(
+            "interp", "alias", "", self.text._w, "", "::syntax_editor_text_proxy",
+            self._text_cmd, self.register(self._on_text_edit)
+        )
         
         # Track cursor position for status bar
         self.text.bind("<KeyRelease>", self._update_status_bar)
@@ -122,14 +166,77 @@ class SyntaxEditor(tk.Frame):
         self.text.insert(tk.INSERT, " " * 4)
         return "break"  # Prevent default tab behavior
     
+    def _on_text_edit(self, start_line, lines_before, lines_after):
+        """Record the lines changed by an edit, as reported by the text proxy"""
+        lines_before = int(lines_before)
+        start_line = min(int(start_line), lines_before)
+        line_delta = int(lines_after) - lines_before
+        self._mark_dirty(start_line, start_line + max(line_delta, 0), line_delta)
+    
+    def _mark_dirty(self, start_line, end_line, line_delta):
+        """Merge an edited line range into the pending dirty range"""
+        if self._dirty_start_line is None:
+            self._dirty_start_line = start_line
+            self._dirty_end_line = end_line
+            return
+        
+        # Lines recorded below the edit moved by the number of lines it added/removed
+        if self._dirty_end_line >= start_line:
+            self._dirty_end_line = max(self._dirty_end_line + line_delta, start_line)
+        
+        self._dirty_start_line = min(self._dirty_start_line, start_line)
+        self._dirty_end_line = max(self._dirty_end_line, end_line)
+    
+    def _take_dirty_range(self):
+        """Return the pending dirty line range and reset it"""
+        dirty_range = (self._dirty_start_line, self._dirty_end_line)
+        self._dirty_start_line = None
+        self._dirty_end_line = None
+        return dirty_range
+    
     def _on_modified(self, event):
         """Handle text modification events"""
         if self.text.edit_modified():
             self._modified = True
             self.text.edit_modified(False)
             
-            # Update syntax highlighting
-            self.highlighter.highlight_text(self.current_language)
+            # Coalesce bursts of edits (fast typing) into one highlight pass
+            if self._highlight_after_id:
+                self.text.after_cancel(self._highlight_after_id)
+            self._highlight_after_id = self.text.after(40, self._highlight_changes)
+    
+    def _highlight_changes(self):
+        """Update syntax highlighting for the lines edited since the last pass"""
+        self._highlight_after_id = None
+        start_line, end_line = self._take_dirty_range()
+        if start_line is not None:
+            self.highlighter.highlight_text(
+                self.current_language, start_line, end_line, self._highlight_stop_line()
+            )
+    
+    def _on_yscroll(self, first, last):
+        """Update the vertical scrollbar and line numbers, and highlight the lines scrolled into view"""
+        self.y_scrollbar.set(first, last)
+        self.line_numbers.schedule_redraw()
+        
+        if self._viewport_after_id:
+            self.text.after_cancel(self._viewport_after_id)
+        self._viewport_after_id = self.text.after(20, self._highlight_viewport)
+    
+    def _highlight_viewport(self):
+        """Highlight the lines currently in view"""
+        self._viewport_after_id = None
+        self.highlighter.highlight_through(self.current_language, self._highlight_stop_line())
+    
+    def _visible_range(self):
+        """Get the first and last line numbers visible in the text widget"""
+        first_line = int(self.text.index("@0,0").split(".")[0])
+        last_line = int(self.text.index(f"@0,{self.text.winfo_height()}").split(".")[0])
+        return first_line, last_line
+    
+    def _highlight_stop_line(self):
+        """Get the last line worth highlighting: the bottom of the viewport plus a margin"""
+        return self._visible_range()[1] + VIEWPORT_MARGIN
     
     def _update_status_bar(self, event=None):
         """Update the status bar with cursor position"""
@@ -150,12 +257,15 @@ class SyntaxEditor(tk.Frame):
         self.text.delete(1.0, tk.END)
         self._modified = False
     
-    def set_content(self, content):
-        """Set the editor content"""
+    def set_content(self, content, language=None):
+        """Set the editor content, switching to the given language first so it is highlighted once"""
         self.clear()
         self.text.insert(tk.END, content)
         self._modified = False
-        self.highlighter.highlight_text(self.current_language)
+        self._take_dirty_range()
+        if language is not None:
+            self.current_language = language
+        self.highlighter.highlight_text(self.current_language, stop_line=self._highlight_stop_line())
     
     def get_content(self):
         """Get the editor content"""
@@ -202,5 +312,8 @@ class SyntaxEditor(tk.Frame):
     
     def set_language(self, language):
         """Set the syntax highlighting language"""
+        if language == self.current_language:
+            return  # Highlighting is already up to date
+        
         self.current_language = language
-        self.highlighter.highlight_text(language)
+        self.highlighter.highlight_text(language, stop_line=self._highlight_stop_line())
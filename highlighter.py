@@ -1,36 +1,106 @@
 """
 Syntax Highlighting Editor - Syntax Highlighter Component
 """
-import tkinter as tk
-import re
+from tkinter import font
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from tokenizer import PythonTokenizer, JavaScriptTokenizer, HTMLTokenizer, CSSTokenizer
 
+# Tokenizers are stateless, so every highlighter shares the same instances
+_TOKENIZERS = {
+    "python": PythonTokenizer(),
+    "javascript": JavaScriptTokenizer(),
+    "html": HTMLTokenizer(),
+    "css": CSSTokenizer()
+}
+
+# Marks a line whose end-of-line tokenizer state is not known
+_UNKNOWN_STATE = object()
+
+# Ranges with at least this many lines are tokenized off the Tk main thread
+BACKGROUND_LINES = 1000
+
+# Maximum number of tokens tagged per event loop tick for background results
+TAG_BATCH_SIZE = 500
+
+# Number of background tokenization results kept for reuse
+TOKEN_CACHE_SIZE = 8
+
+# Lines fetched per text.get when reading on past an edit; the chunk size
+# doubles up to the maximum while the tokenizer state keeps diverging
+MIN_CHUNK_LINES = 8
+MAX_CHUNK_LINES = 512
+
+
+def _tokenize_lines(tokenizer, lines, state):
+    """
+    Tokenize consecutive lines starting in the given state (runs on the worker thread).
+    Returns the tokens as parallel arrays (types, start columns, end columns, and the
+    token count through each line) and the end state of each line.
+    """
+    # Parallel arrays keep large results compact, with no tuple per token
+    types = []
+    starts = array("i")
+    ends = array("i")
+    line_ends = array("i")
+    states = []
+    for line in lines:
+        tokens, state = tokenizer.tokenize_line_cached(line, state)
+        for token_type, start_col, end_col in tokens:
+            types.append(token_type)
+            starts.append(start_col)
+            ends.append(end_col)
+        line_ends.append(len(types))
+        states.append(state)
+    
+    return (types, starts, ends, line_ends), states
+
+
 class SyntaxHighlighter:
     """Handles syntax highlighting for the text editor"""
     def __init__(self, text_widget):
         self.text = text_widget
         
+        # Fonts shared by the bold and italic tags, built once instead of per tag
+        self._bold_font = font.Font(root=self.text, family="Courier New", size=12, weight="bold")
+        self._italic_font = font.Font(root=self.text, family="Courier New", size=12, slant="italic")
+        
         # Define tag configurations for different token types
         self._setup_tags()
         
         # Initialize tokenizers
-        self.tokenizers = {
-            "python": PythonTokenizer(),
-            "javascript": JavaScriptTokenizer(),
-            "html": HTMLTokenizer(),
-            "css": CSSTokenizer()
-        }
+        self.tokenizers = _TOKENIZERS
+        
+        # Tokenizer state at the end of each line (index = line - 1), so that
+        # re-highlighting can resume mid-document and stop once states converge
+        self._state_cache = []
+        self._state_cache_language = None
+        
+        # Number of leading lines that are highlighted and have a cached state
+        self._highlighted_lines = 0
+        
+        # Large ranges are tokenized on a worker thread; results from an older
+        # generation are dropped since the text changed in the meantime
+        self._tokenize_executor = ThreadPoolExecutor(max_workers=1)
+        self._tokenize_future = None
+        self._generation = 0
+        self._job_last_line = None
+        
+        # Recent background results keyed by (tokenizer, start state, text length, text hash)
+        self._token_cache = OrderedDict()
     
     def _setup_tags(self):
         """Set up text tags for syntax highlighting with a cheerful color scheme"""
         # Keywords - bright purple
-        self.text.tag_configure("keyword", foreground="#9D00FF", font=("Courier New", 12, "bold"))
+        self.text.tag_configure("keyword", foreground="#9D00FF", font=self._bold_font)
         
         # Strings - vibrant green
         self.text.tag_configure("string", foreground="#00CC66")
         
         # Comments - teal blue
-        self.text.tag_configure("comment", foreground="#00A5A5", font=("Courier New", 12, "italic"))
+        self.text.tag_configure("comment", foreground="#00A5A5", font=self._italic_font)
         
         # Numbers - bright orange
         self.text.tag_configure("number", foreground="#FF6600")
@@ -39,7 +109,7 @@ class SyntaxHighlighter:
         self.text.tag_configure("function", foreground="#4169E1")
         
         # Classes - crimson
-        self.text.tag_configure("class", foreground="#DC143C", font=("Courier New", 12, "bold"))
+        self.text.tag_configure("class", foreground="#DC143C", font=self._bold_font)
         
         # Operators - deep pink
         self.text.tag_configure("operator", foreground="#FF1493")
@@ -58,47 +128,268 @@ class SyntaxHighlighter:
         
         # CSS values - lime green
         self.text.tag_configure("value", foreground="#32CD32")
-    
-    def highlight_text(self, language):
-        """Apply syntax highlighting to the text"""
-        # Get the text content
-        content = self.text.get("1.0", tk.END)
-        
-        # Remove all existing tags
-        for tag in self.text.tag_names():
-            if tag != "sel":  # Don't remove selection tag
-                self.text.tag_remove(tag, "1.0", tk.END)
         
+        # Remember the highlighting tags so they don't have to be queried per token
+        self._known_tags = frozenset(self.text.tag_names()) - {"sel"}
+    
+    def highlight_text(self, language, start_line=None, end_line=None, stop_line=None):
+        """
+        Apply syntax highlighting to the text.
+        When an edited range start_line..end_line is given, re-highlighting starts
+        there and continues past it only until the tokenizer state matches the
+        cached state again; otherwise the whole document is highlighted.
+        Lines past stop_line (e.g. below the viewport) are left for highlight_through.
+        """
         # Get the tokenizer for the selected language
         tokenizer = self.tokenizers.get(language)
         if not tokenizer:
-            return  # No tokenizer available for this language
+            # No tokenizer available for this language, so just clear the old highlighting once
+            if self._state_cache_language is not None:
+                self._cancel_background_job()
+                self._state_cache_language = None
+                self._reset_tags()
+            return
+        
+        self._cancel_background_job()
+        
+        line_count = int(self.text.index("end-1c").split(".")[0])
+        if stop_line is None:
+            stop_line = line_count
+        
+        if start_line is None or not self._update_state_cache(language, start_line, end_line, line_count):
+            # Highlight everything from scratch, dropping all old tags at once
+            self._reset_tags()
+            self._state_cache = [_UNKNOWN_STATE] * line_count
+            self._state_cache_language = language
+            self._highlighted_lines = 0
+        elif start_line <= self._highlighted_lines + 1:
+            self._highlight_lines(tokenizer, start_line, end_line, stop_line, line_count)
+        
+        self._extend_highlighting(tokenizer, stop_line, line_count)
+    
+    def highlight_through(self, language, line):
+        """Make sure lines up to the given line are highlighted, e.g. after scrolling"""
+        tokenizer = self.tokenizers.get(language)
+        if not tokenizer or language != self._state_cache_language:
+            return
         
-        # Tokenize the content
-        tokens = tokenizer.tokenize(content)
+        line_count = int(self.text.index("end-1c").split(".")[0])
+        if line_count != len(self._state_cache):
+            return  # An edit is pending, highlight_text will catch up
         
-        # Apply highlighting based on token types
-        for token_type, start, end in tokens:
-            start_index = self._get_index_from_position(start)
-            end_index = self._get_index_from_position(end)
+        if self._job_last_line is not None:
+            if line <= self._job_last_line:
+                return  # The background job already covers these lines
+            self._cancel_background_job()
+        
+        self._extend_highlighting(tokenizer, line, line_count)
+    
+    def _extend_highlighting(self, tokenizer, stop_line, line_count):
+        """Highlight lines after the already highlighted ones up to stop_line"""
+        if self._job_last_line is not None:
+            return  # A background job is already highlighting them
+        
+        if self._highlighted_lines < min(stop_line, line_count):
+            start_line = self._highlighted_lines + 1
+            self._highlight_lines(tokenizer, start_line, stop_line, stop_line, line_count)
+    
+    def _highlight_lines(self, tokenizer, start_line, end_line, stop_line, line_count):
+        """
+        Re-highlight from start_line until the state converges after end_line,
+        or until stop_line if that comes first.
+        """
+        last_line = min(stop_line, line_count)
+        if min(end_line, last_line) - start_line + 1 >= BACKGROUND_LINES:
+            self._start_background_job(tokenizer, start_line, last_line, line_count)
+            return
+        
+        state = self._state_before(tokenizer, start_line)
+        
+        line_tokens = []
+        line_num = start_line - 1
+        converged = False
+        for line in self._iter_lines(start_line, min(end_line, last_line), last_line):
+            line_num += 1
+            tokens, state = tokenizer.tokenize_line_cached(line, state)
+            line_tokens.append((line_num, tokens))
             
-            # Apply the appropriate tag
-            if token_type in self.text.tag_names():
-                # Make sure we're not overlapping with existing tags
-                self.text.tag_add(token_type, start_index, end_index)
+            # Past the edit, later lines are unaffected once the state converges
+            converged = line_num >= end_line and self._state_cache[line_num - 1] == state
+            self._state_cache[line_num - 1] = state
+            if converged:
+                break
+        
+        if not converged:
+            # Stopped early, so states and tags of the lines below are stale
+            self._highlighted_lines = line_num
+            self._state_cache[line_num:] = [_UNKNOWN_STATE] * (line_count - line_num)
+        
+        if line_tokens:
+            self._clear_tags(start_line, line_num)
+            self._apply_tokens(line_tokens)
+    
+    def _state_before(self, tokenizer, line_num):
+        """Get the tokenizer state at the start of a line"""
+        if line_num > 1:
+            return self._state_cache[line_num - 2]
+        return tokenizer.initial_state
+    
+    def _start_background_job(self, tokenizer, start_line, last_line, line_count):
+        """Tokenize lines start_line..last_line on the worker thread"""
+        text = self.text.get(f"{start_line}.0", f"{last_line}.end")
+        state = self._state_before(tokenizer, start_line)
+        
+        # Reuse the result for identical text, e.g. when undoing a large paste
+        cache_key = (tokenizer, state, len(text), hash(text))
+        if cache_key in self._token_cache:
+            self._token_cache.move_to_end(cache_key)
+            future = Future()
+            future.set_result(self._token_cache[cache_key])
+        else:
+            future = self._tokenize_executor.submit(_tokenize_lines, tokenizer, text.split("\n"), state)
+        
+        # The lines stay unhighlighted until the job's tags are applied
+        self._highlighted_lines = start_line - 1
+        self._state_cache[start_line - 1:] = [_UNKNOWN_STATE] * (line_count - start_line + 1)
+        
+        self._tokenize_future = future
+        self._job_last_line = last_line
+        self.text.after(15, self._drain_background_job, self._generation, line_count, start_line, cache_key)
+    
+    def _cancel_background_job(self):
+        """Drop the running background job, if any"""
+        self._generation += 1
+        self._job_last_line = None
+        if self._tokenize_future is not None:
+            self._tokenize_future.cancel()
+            self._tokenize_future = None
+    
+    def _job_is_current(self, generation, line_count):
+        """Check that the text didn't change since a background job was started"""
+        if generation != self._generation:
+            return False
+        
+        if int(self.text.index("end-1c").split(".")[0]) != line_count:
+            # An edit is pending, highlight_text will start over
+            self._cancel_background_job()
+            return False
+        return True
+    
+    def _drain_background_job(self, generation, line_count, start_line, cache_key):
+        """Poll the background job and start tagging its result once it is done"""
+        if generation != self._generation:
+            return
+        
+        if not self._tokenize_future.done():
+            self.text.after(15, self._drain_background_job, generation, line_count, start_line, cache_key)
+            return
+        
+        result = self._tokenize_future.result()
+        self._tokenize_future = None
+        
+        self._token_cache[cache_key] = result
+        if len(self._token_cache) > TOKEN_CACHE_SIZE:
+            self._token_cache.popitem(last=False)
+        
+        if not self._job_is_current(generation, line_count):
+            return
+        
+        token_arrays, states = result
+        self._clear_tags(start_line, start_line + len(states) - 1)
+        self._apply_token_batch(generation, line_count, start_line, token_arrays, states, 0)
+    
+    def _apply_token_batch(self, generation, line_count, start_line, token_arrays, states, position):
+        """Tag a batch of a background job's lines, yielding to the event loop between batches"""
+        if not self._job_is_current(generation, line_count):
+            return
+        
+        # Take whole lines until the batch holds at least TAG_BATCH_SIZE tokens
+        types, starts, ends, line_ends = token_arrays
+        first_token = line_ends[position - 1] if position else 0
+        end_position = min(bisect_left(line_ends, first_token + TAG_BATCH_SIZE, position) + 1, len(line_ends))
+        
+        tag_ranges = defaultdict(list)
+        for position in range(position, end_position):
+            line_num = start_line + position
+            for i in range(first_token, line_ends[position]):
+                if types[i] in self._known_tags:
+                    tag_ranges[types[i]].extend((f"{line_num}.{starts[i]}", f"{line_num}.{ends[i]}"))
+            first_token = line_ends[position]
+        self._add_tag_ranges(tag_ranges)
+        
+        position = end_position
+        if position < len(line_ends):
+            self.text.after(1, self._apply_token_batch, generation, line_count, start_line, token_arrays, states, position)
+            return
+        
+        # All lines are tagged, so they now count as highlighted
+        self._state_cache[start_line - 1:start_line - 1 + len(states)] = states
+        self._highlighted_lines = start_line - 1 + len(states)
+        self._job_last_line = None
+    
+    def _update_state_cache(self, language, start_line, end_line, line_count):
+        """
+        Realign the state cache after lines start_line..end_line were edited.
+        Returns False if the cache can't be reused and a full highlight is needed.
+        """
+        if language != self._state_cache_language:
+            return False
+        
+        # Lines below the edited range only moved by the number of lines added or removed
+        line_delta = line_count - len(self._state_cache)
+        old_end_line = end_line - line_delta
+        if not 1 <= start_line <= end_line <= line_count or old_end_line < start_line:
+            return False
+        
+        # Keep the old end state of the range's last line to detect convergence
+        self._state_cache[start_line - 1:old_end_line - 1] = [_UNKNOWN_STATE] * (end_line - start_line)
+        
+        if old_end_line <= self._highlighted_lines:
+            self._highlighted_lines += line_delta
+        else:
+            self._highlighted_lines = min(self._highlighted_lines, start_line - 1)
+        return True
+    
+    def _iter_lines(self, start_line, end_line, last_line):
+        """Yield the text of lines start_line..last_line, fetching past end_line in growing chunks"""
+        if start_line > last_line:
+            return
+        
+        yield from self.text.get(f"{start_line}.0", f"{end_line}.end").split("\n")
+        
+        # Usually the state converges right after the edit, so start small
+        chunk_start = end_line + 1
+        chunk_lines = MIN_CHUNK_LINES
+        while chunk_start <= last_line:
+            chunk_end = min(chunk_start + chunk_lines - 1, last_line)
+            yield from self.text.get(f"{chunk_start}.0", f"{chunk_end}.end").split("\n")
+            chunk_start = chunk_end + 1
+            chunk_lines = min(chunk_lines * 2, MAX_CHUNK_LINES)
+    
+    def _clear_tags(self, start_line, end_line):
+        """Remove highlighting tags from lines start_line..end_line"""
+        for tag in self._known_tags:
+            self.text.tag_remove(tag, f"{start_line}.0", f"{end_line}.end")
+    
+    def _reset_tags(self):
+        """Remove all highlighting by deleting and recreating the tags, instead of sweeping each one"""
+        self.text.tag_delete(*self._known_tags)
+        self._setup_tags()
+    
+    def _apply_tokens(self, line_tokens):
+        """Apply highlighting tags for a list of (line_number, tokens) pairs"""
+        # Collect the ranges of each tag so that every tag is added with a single call
+        tag_ranges = defaultdict(list)
+        for line_num, tokens in line_tokens:
+            for token_type, start_col, end_col in tokens:
+                if token_type not in self._known_tags:
+                    continue
                 
-                # Special handling for function calls to highlight parentheses
-                if token_type == "function":
-                    # Find the opening parenthesis position
-                    text_range = self.text.get(start_index, end_index)
-                    paren_pos = text_range.rfind("(")
-                    if paren_pos >= 0:
-                        # Calculate the position of the opening parenthesis
-                        paren_index = f"{start[0]}.{start[1] + paren_pos}"
-                        # Apply operator tag to the parenthesis
-                        self.text.tag_add("operator", paren_index, f"{start[0]}.{start[1] + paren_pos + 1}")
-    
-    def _get_index_from_position(self, position):
-        """Convert a (line, column) position to a Tkinter text index"""
-        line, col = position
-        return f"{line}.{col}"
+                tag_ranges[token_type].extend((f"{line_num}.{start_col}", f"{line_num}.{end_col}"))
+        
+        self._add_tag_ranges(tag_ranges)
+    
+    def _add_tag_ranges(self, tag_ranges):
+        """Add each tag's collected index pairs with a single call per tag"""
+        for tag, indices in tag_ranges.items():
+            self.text.tag_add(tag, *indices)
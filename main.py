@@ -3,10 +3,18 @@
 Syntax Highlighting Editor - Main Application
 """
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext, ttk
+from tkinter import filedialog, messagebox, ttk
 import os
 from editor import SyntaxEditor
 
+# Highlighting language for each recognized file extension
+EXT_LANG = {
+    '.py': "python",
+    '.js': "javascript",
+    '.html': "html",
+    '.css': "css"
+}
+
 class SyntaxHighlightingApp:
     def __init__(self, root):
         self.root = root
@@ -128,24 +136,14 @@ class SyntaxHighlightingApp:
                 with open(file_path, 'r') as file:
                     content = file.read()
                 
-                self.editor.set_content(content)
+                # Auto-detect language based on file extension
+                language = EXT_LANG.get(os.path.splitext(file_path)[1].lower())
+                if language:
+                    self.language_var.set(language)
+                
+                self.editor.set_content(content, language)
                 self.current_file = file_path
                 self.root.title(f"Syntax Highlighting Editor - {os.path.basename(file_path)}")
-                
-                # Auto-detect language based on file extension
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext == '.py':
-                    self.set_language("python")
-                    self.language_var.set("python")
-                elif ext == '.js':
-                    self.set_language("javascript")
-                    self.language_var.set("javascript")
-                elif ext == '.html':
-                    self.set_language("html")
-                    self.language_var.set("html")
-                elif ext == '.css':
-                    self.set_language("css")
-                    self.language_var.set("css")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to open file: {str(e)}")
     
@@ -181,19 +179,10 @@ class SyntaxHighlightingApp:
             self.current_file = file_path
             self.root.title(f"Syntax Highlighting Editor - {os.path.basename(file_path)}")
             # Update language based on saved file extension
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext == '.py':
-                self.language_var.set("python")
-                self.set_language("python")
-            elif ext == '.js':
-                self.language_var.set("javascript")
-                self.set_language("javascript")
-            elif ext == '.html':
-                self.language_var.set("html")
-                self.set_language("html")
-            elif ext == '.css':
-                self.language_var.set("css")
-                self.set_language("css")
+            language = EXT_LANG.get(os.path.splitext(file_path)[1].lower())
+            if language:
+                self.language_var.set(language)
+                self.set_language(language)
             return self.save_file()
         return False
     
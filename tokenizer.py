@@ -1,448 +1,627 @@
 """
 Syntax Highlighting Editor - Tokenizer Component
 """
+import os
 import re
+from functools import lru_cache
+
+# Google's RE2 (pip install google-re2) is used for the token regexes only when
+# opted into with SYNTAX_EDITOR_RE2=1; re is the default. The tokenizer classes
+# compile their regexes at import, so the flag is read from the environment
+# rather than set on the module afterwards
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+USE_RE2 = os.environ.get('SYNTAX_EDITOR_RE2', '0') == '1'
+
+# Compiled regexes by pattern, so tokenizers with identical patterns share them
+_PATTERN_CACHE = {}
+
+# Number of (tokenizer, line, state) results kept by tokenize_line_cached
+LINE_CACHE_SIZE = 8192
+
+# Longer lines bypass the cache: each edit to one makes a new entry holding the
+# whole line and its tokens, and earlier versions of the line are never reused
+LINE_CACHE_MAX_LENGTH = 1000
+
+
+def _compile_pattern(pattern):
+    """Compile a token regex, with RE2 if enabled and it supports the pattern"""
+    compiled = _PATTERN_CACHE.get(pattern)
+    if compiled is not None:
+        return compiled
+    
+    # RE2 rules out catastrophic backtracking (ReDoS), but is slower here: the
+    # tokenizers match at many positions per line, and the google-re2 wrapper
+    # re-encodes the whole line to UTF-8 on every call, making each token cost
+    # O(len(line)) and long lines quadratic
+    compiled = None
+    if USE_RE2 and re2 is not None:
+        try:
+            compiled = re2.compile(pattern)
+        except re2.error:
+            pass  # Fall back to re for syntax RE2 doesn't support
+    if compiled is None:
+        compiled = re.compile(pattern)
+    
+    _PATTERN_CACHE[pattern] = compiled
+    return compiled
+
+
+def _combine_patterns(patterns):
+    """
+    Combine (pattern, token_type) pairs into a single alternation regex.
+    The alternatives are tried in list order at each position, like the list itself.
+    Returns the compiled regex and a tuple of token types indexed by group number,
+    for dispatching on match.lastindex (cheaper than looking up match.lastgroup).
+    """
+    master = _compile_pattern('|'.join(f'(?P<t{i}>{pattern})' for i, (pattern, _) in enumerate(patterns)))
+    
+    # Groups inside the patterns themselves never end a match, so they map to None
+    group_types = [None] * (master.groups + 1)
+    for i, (_, token_type) in enumerate(patterns):
+        group_types[master.groupindex[f't{i}']] = token_type
+    return master, tuple(group_types)
+
+
+def _merge_adjacent_tokens(tokens):
+    """Merge tokens of the same type that touch, e.g. the operators of "+=" or "();" """
+    merged = []
+    for token in tokens:
+        if merged and merged[-1][0] == token[0] and merged[-1][2] == token[1]:
+            merged[-1] = (token[0], merged[-1][1], token[2])
+        else:
+            merged.append(token)
+    return merged
+
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def _tokenize_line_cached(tokenizer, line, state):
+    """Tokenize a line, remembering the result for lines and states that repeat"""
+    tokens, state = tokenizer.tokenize_line(line, state)
+    return tuple(_merge_adjacent_tokens(tokens)), state
+
+
+# Identifiers take the place of the keyword pattern; they are classified by a
+# keyword set lookup rather than a long regex alternation of keywords
+_IDENTIFIER = (r'\b[A-Za-z_]\w*', 'identifier')
+
 
 class BaseTokenizer:
     """Base class for language tokenizers"""
-    def tokenize(self, text):
+    # Tokenizer state at the start of a document
+    initial_state = None
+    
+    # Keywords of the language, and the combined patterns that come after the
+    # identifier pattern for identifiers that are not keywords
+    _keywords = frozenset()
+    _after_identifier = None
+    _after_identifier_types = ()
+    
+    def tokenize(self, text, state=None):
         """
-        Tokenize the input text.
+        Tokenize the input text, starting in the given state (the initial state by default).
         Returns a list of (token_type, start_position, end_position) tuples.
         """
-        raise NotImplementedError("Subclasses must implement tokenize method")
+        if state is None:
+            state = self.initial_state
+        
+        tokens = []
+        for line_num, line in enumerate(text.split('\n'), 1):
+            line_tokens, state = self.tokenize_line_cached(line, state)
+            for token_type, start_col, end_col in line_tokens:
+                tokens.append((token_type, (line_num, start_col), (line_num, end_col)))
+        
+        return tokens
+    
+    def tokenize_line(self, line, state):
+        """
+        Tokenize a single line starting in the given state.
+        Returns a (tokens, state) tuple where tokens is a list of
+        (token_type, start_column, end_column) tuples and state is the
+        tokenizer state at the end of the line.
+        """
+        raise NotImplementedError("Subclasses must implement tokenize_line method")
     
-    def _create_token(self, token_type, match, line_offset=0, col_offset=0):
+    def tokenize_line_cached(self, line, state):
         """
-        Create a token from a regex match.
-        Returns a tuple of (token_type, start_position, end_position).
+        Like tokenize_line, but reuses the result when the same line was tokenized
+        in the same state before, and with touching tokens of the same type merged.
+        The tokens are a tuple since results are shared. Lines longer than
+        LINE_CACHE_MAX_LENGTH are tokenized without the cache.
         """
-        start_line, start_col = self._get_position(match.start(), line_offset, col_offset)
-        end_line, end_col = self._get_position(match.end(), line_offset, col_offset)
+        if len(line) > LINE_CACHE_MAX_LENGTH:
+            tokens, state = self.tokenize_line(line, state)
+            return tuple(_merge_adjacent_tokens(tokens)), state
+        return _tokenize_line_cached(self, line, state)
+    
+    def _classify_identifier(self, match, line, endpos):
+        """
+        Classify an identifier match: keywords become keyword tokens, and other
+        identifiers are matched against the patterns after the identifier pattern.
+        Returns the resulting match and token type, or (None, None) if nothing matches.
+        """
+        if match.group() in self._keywords:
+            return match, 'keyword'
         
-        return (token_type, (start_line, start_col), (end_line, end_col))
+        match = self._after_identifier.match(line, match.start(), endpos)
+        if match:
+            return match, self._after_identifier_types[match.lastindex]
+        return None, None
+    
+    def _scan_string(self, line, pos, endpos):
+        """
+        Find the end of the string literal whose opening quote is at pos, without
+        looking past endpos. Returns the position after the closing quote, or None
+        if the string is not closed.
+        """
+        quote = line[pos]
+        end = line.find(quote, pos + 1, endpos)
+        while end != -1:
+            # The quote closes the string unless an odd number of backslashes escape it
+            escape_start = end - 1
+            while line[escape_start] == '\\':
+                escape_start -= 1
+            if (end - 1 - escape_start) % 2 == 0:
+                return end + 1
+            end = line.find(quote, end + 1, endpos)
+        return None
     
-    def _get_position(self, index, line_offset, col_offset):
+    def _add_token(self, tokens, match, group_types, line, endpos):
         """
-        Convert a flat index to a (line, column) position.
-        This is a placeholder - subclasses should implement this based on their text processing.
+        Add the token for a combined regex match to tokens, scanning strings and
+        classifying identifiers. Returns the end of the token, or None if no token
+        starts at the match.
         """
-        return (1, index)  # Default implementation
+        token_type = group_types[match.lastindex]
+        if token_type == 'line_comment':
+            # Only the comment marker is matched; the rest of the line is the comment
+            tokens.append(('comment', match.start(), endpos))
+            return endpos
+        
+        if token_type == 'quote':
+            # Strings are scanned with str.find rather than matched by a regex
+            string_start = match.start()
+            string_end = self._scan_string(line, string_start, endpos)
+            if string_end is not None:
+                tokens.append(('string', string_start, string_end))
+            return string_end
+        
+        if token_type == 'identifier':
+            match, token_type = self._classify_identifier(match, line, endpos)
+            if not match:
+                return None
+        token_end = match.end()
+        tokens.append((token_type, match.start(), token_end))
+        
+        # Highlight the parenthesis of function calls as an operator
+        if token_type == 'function':
+            self._add_paren_token(tokens, match)
+        return token_end
+    
+    def _add_paren_token(self, tokens, match):
+        """Add an operator token for the opening parenthesis of a function match, if it has one"""
+        paren_pos = match.group().rfind('(')
+        if paren_pos >= 0:
+            paren_start = match.start() + paren_pos
+            tokens.append(('operator', paren_start, paren_start + 1))
 
 
 class PythonTokenizer(BaseTokenizer):
     """Tokenizer for Python code"""
-    def __init__(self):
-        # Define regex patterns for Python tokens
-        self.patterns = [
-            # Strings (triple-quoted) - must come before keywords to avoid matching keywords inside strings
-            (r'""".*?"""|\'\'\'.*?\'\'\'', 'string'),
-            
-            # Strings (single and double quoted) - must come before keywords
-            (r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', 'string'),
-            
-            # Comments - must come before keywords
-            (r'#.*$', 'comment'),
-            
-            # Keywords
-            (r'\b(and|as|assert|async|await|break|class|continue|def|del|elif|else|except|'
-             r'finally|for|from|global|if|import|in|is|lambda|nonlocal|not|or|pass|raise|'
-             r'return|try|while|with|yield)\b', 'keyword'),
-            
-            # Decorators
-            (r'@\w+', 'decorator'),
-            
-            # Numbers
-            (r'\b\d+\.\d+\b|\b\d+\b', 'number'),
-            
-            # Function definitions
-            (r'def\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'function'),
-            
-            # Class definitions
-            (r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'class'),
-            
-            # Function calls
-            (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\(', 'function'),
-            
-            # Operators
-            (r'[\+\-\*\/\%\=\<\>\!\&\|\^\~\:\,\.\;]', 'operator')
-        ]
+    # Opening quotes of a triple-quoted string that spans lines, or None
+    initial_state = None
     
-    def tokenize(self, text):
-        """Tokenize the input text.
-        Returns a list of (token_type, start_position, end_position) tuples.
+    # Regex patterns for Python tokens
+    patterns = [
+        # Strings (single, double and triple quoted), scanned by _scan_string - must come before keywords
+        (r'["\']', 'quote'),
+        
+        # Comments, which run to the end of the line - must come before keywords
+        (r'#', 'line_comment'),
+        
+        # Identifiers, classified as keywords or by the patterns below
+        _IDENTIFIER,
+        
+        # Decorators
+        (r'@\w+', 'decorator'),
+        
+        # Numbers
+        (r'\b\d+\.\d+\b|\b\d+\b', 'number'),
+        
+        # Function definitions
+        (r'def\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'function'),
+        
+        # Class definitions
+        (r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'class'),
+        
+        # Function calls
+        (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\(', 'function'),
+        
+        # Operators
+        (r'[\+\-\*\/\%\=\<\>\!\&\|\^\~\:\,\.\;]', 'operator')
+    ]
+    _master, _group_types = _combine_patterns(patterns)
+    _after_identifier, _after_identifier_types = _combine_patterns(patterns[patterns.index(_IDENTIFIER) + 1:])
+    
+    _keywords = frozenset((
+        'and', 'as', 'assert', 'async', 'await', 'break', 'class', 'continue', 'def', 'del',
+        'elif', 'else', 'except', 'finally', 'for', 'from', 'global', 'if', 'import', 'in',
+        'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try', 'while',
+        'with', 'yield'
+    ))
+    
+    def _scan_string(self, line, pos, endpos):
+        """Find the end of the string literal at pos, which may be triple-quoted"""
+        triple_quote = line[pos] * 3
+        if line.startswith(triple_quote, pos, endpos):
+            end = line.find(triple_quote, pos + 3, endpos)
+            if end != -1:
+                return end + 3
+        return super()._scan_string(line, pos, endpos)
+    
+    def tokenize_line(self, line, state):
+        """Tokenize a single line.
+        Returns a list of (token_type, start_column, end_column) tuples and the end-of-line state.
         """
+        # Bind the hot loop's lookups to locals once per line
+        search = self._master.search
+        add_token = self._add_token
+        group_types = self._group_types
+        line_len = len(line)
+        
         tokens = []
-        lines = text.split('\n')
-        
-        # Track state for multi-line constructs
-        in_string = False
-        in_comment = False
-        string_start = (0, 0)
-        comment_start = (0, 0)
-        
-        for line_num, line in enumerate(lines, 1):
-            line_pos = 0
-            while line_pos < len(line):
-                # If we're not in a special state, look for tokens
-                if not in_string and not in_comment:
-                    match = None
-                    for pattern, token_type in self.patterns:
-                        regex = re.compile(pattern)
-                        match = regex.search(line, line_pos)
-                        if match and match.start() == line_pos:
-                            # Found a token
-                            start_pos = (line_num, match.start())
-                            end_pos = (line_num, match.end())
-                            tokens.append((token_type, start_pos, end_pos))
-                            line_pos = match.end()
-                            break
-                    
-                    # If no token found, move to the next character
-                    if not match or match.start() != line_pos:
-                        line_pos += 1
-                else:
-                    # We're in a string or comment, just move to the next character
-                    line_pos += 1
+        line_pos = 0
+        if state is not None:
+            # Continue the triple-quoted string from the previous line
+            string_end = line.find(state)
+            if string_end == -1:
+                if line:
+                    tokens.append(('string', 0, line_len))
+                return tokens, state
+            
+            tokens.append(('string', 0, string_end + 3))
+            line_pos = string_end + 3
         
-        return tokens
+        while True:
+            match = search(line, line_pos)
+            if not match:
+                break
+            
+            if group_types[match.lastindex] == 'quote':
+                triple_quote = line[match.start()] * 3
+                if line.startswith(triple_quote, match.start()) and line.find(triple_quote, match.start() + 3) == -1:
+                    # Triple-quoted string continues on the next line
+                    tokens.append(('string', match.start(), line_len))
+                    return tokens, triple_quote
+            
+            token_end = add_token(tokens, match, group_types, line, line_len)
+            if token_end is None:
+                # A token may still start inside an unmatched identifier, e.g. "xdef f"
+                token_end = match.start() + 1
+            line_pos = token_end
+        
+        return tokens, None
 
 
 class JavaScriptTokenizer(BaseTokenizer):
     """Tokenizer for JavaScript code"""
-    def __init__(self):
-        # Define regex patterns for JavaScript tokens
-        self.patterns = [
-            # Comments (multi-line) - must come first
-            (r'\/\*[\s\S]*?\*\/', 'comment'),
-            
-            # Comments (single-line) - must come before strings
-            (r'\/\/.*$', 'comment'),
-            
-            # Template string start/end backticks
-            (r'`', 'string'),
-            
-            # Template string interpolation start
-            (r'\${', 'operator'),
-            
-            # Template string interpolation end
-            (r'}', 'operator'),
-            
-            # Strings (single and double quoted) - must come before keywords
-            (r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', 'string'),
-            
-            # Keywords
-            (r'\b(break|case|catch|class|const|continue|debugger|default|delete|do|else|'
-             r'export|extends|finally|for|function|if|import|in|instanceof|new|return|super|'
-             r'switch|this|throw|try|typeof|var|void|while|with|yield|let|static|enum|await|'
-             r'implements|package|protected|interface|private|public)\b', 'keyword'),
-            
-            # Numbers
-            (r'\b\d+\.\d+\b|\b\d+\b', 'number'),
-            
-            # Function definitions
-            (r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'function'),
-            (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*function', 'function'),
-            (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\([^)]*\)\s*=>', 'function'),
-            
-            # Class definitions
-            (r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'class'),
-            
-            # Function calls
-            (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\(', 'function'),
-            
-            # Operators
-            (r'[\+\-\*\/\%\=\<\>\!\&\|\^\~\:\,\.\;]', 'operator')
-        ]
+    # (in_template_string, in_interpolation)
+    initial_state = (False, False)
     
-    def tokenize(self, text):
-        """Tokenize JavaScript code with special handling for template strings"""
+    # Regex patterns for JavaScript tokens
+    patterns = [
+        # Comments (multi-line) - must come first
+        (r'\/\*[\s\S]*?\*\/', 'comment'),
+        
+        # Comments (single-line), which run to the end of the line - must come before strings
+        (r'\/\/', 'line_comment'),
+        
+        # Template string start/end backticks
+        (r'`', 'string'),
+        
+        # Template string interpolation start
+        (r'\${', 'operator'),
+        
+        # Template string interpolation end
+        (r'}', 'operator'),
+        
+        # Strings (single and double quoted), scanned by _scan_string - must come before keywords
+        (r'["\']', 'quote'),
+        
+        # Identifiers, classified as keywords or by the patterns below
+        _IDENTIFIER,
+        
+        # Numbers
+        (r'\b\d+\.\d+\b|\b\d+\b', 'number'),
+        
+        # Function definitions
+        (r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'function'),
+        (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*function', 'function'),
+        (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\([^)]*\)\s*=>', 'function'),
+        
+        # Class definitions
+        (r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)', 'class'),
+        
+        # Function calls
+        (r'([a-zA-Z_][a-zA-Z0-9_]*)\s*\(', 'function'),
+        
+        # Operators
+        (r'[\+\-\*\/\%\=\<\>\!\&\|\^\~\:\,\.\;]', 'operator')
+    ]
+    _master, _group_types = _combine_patterns(patterns)
+    _after_identifier, _after_identifier_types = _combine_patterns(patterns[patterns.index(_IDENTIFIER) + 1:])
+    
+    _keywords = frozenset((
+        'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete',
+        'do', 'else', 'export', 'extends', 'finally', 'for', 'function', 'if', 'import', 'in',
+        'instanceof', 'new', 'return', 'super', 'switch', 'this', 'throw', 'try', 'typeof',
+        'var', 'void', 'while', 'with', 'yield', 'let', 'static', 'enum', 'await',
+        'implements', 'package', 'protected', 'interface', 'private', 'public'
+    ))
+    
+    # Inside an interpolation, without the template string special patterns
+    _interpolation_master, _interpolation_group_types = _combine_patterns(
+        [(pattern, token_type) for pattern, token_type in patterns if pattern not in (r'`', r'\${', r'}')]
+    )
+    
+    # Finds non-whitespace in template string content without slicing it out.
+    # This one stays on re instead of going through _compile_pattern: re's \S
+    # rejects exactly the characters str.isspace() accepts, while RE2's \S only
+    # treats ASCII whitespace as space
+    _non_space = re.compile(r'\S')
+    
+    def tokenize_line(self, line, state):
+        """Tokenize a line of JavaScript code with special handling for template strings"""
         tokens = []
-        lines = text.split('\n')
-        
-        # Track state for multi-line constructs
-        in_template_string = False
-        in_interpolation = False
-        in_comment = False
-        template_string_start = (0, 0)
-        
-        for line_num, line in enumerate(lines, 1):
-            line_pos = 0
-            while line_pos < len(line):
-                # Handle template strings specially
-                if in_template_string and not in_interpolation:
-                    # Look for either the end of the template string or the start of interpolation
-                    backtick_pos = line.find('`', line_pos)
-                    interp_pos = line.find('${', line_pos)
+        
+        # Template strings and their interpolations can span lines
+        in_template_string, in_interpolation = state
+        
+        line_pos = 0
+        while line_pos < len(line):
+            # Handle template strings specially
+            if in_template_string and not in_interpolation:
+                # Look for either the end of the template string or the start of interpolation
+                backtick_pos = line.find('`', line_pos)
+                interp_pos = line.find('${', line_pos)
+                
+                if backtick_pos != -1 and (interp_pos == -1 or backtick_pos < interp_pos):
+                    # Found end of template string
+                    if self._non_space.search(line, line_pos, backtick_pos):
+                        # Add the string content
+                        tokens.append(('string', line_pos, backtick_pos))
                     
-                    if backtick_pos != -1 and (interp_pos == -1 or backtick_pos < interp_pos):
-                        # Found end of template string
-                        if line_pos < backtick_pos:
-                            # Add the string content
-                            tokens.append(('string', (line_num, line_pos), (line_num, backtick_pos)))
-                        
-                        # Add the closing backtick
-                        tokens.append(('string', (line_num, backtick_pos), (line_num, backtick_pos + 1)))
-                        in_template_string = False
-                        line_pos = backtick_pos + 1
-                    elif interp_pos != -1:
-                        # Found start of interpolation
-                        if line_pos < interp_pos:
-                            # Add the string content
-                            tokens.append(('string', (line_num, line_pos), (line_num, interp_pos)))
-                        
-                        # Add the ${
-                        tokens.append(('operator', (line_num, interp_pos), (line_num, interp_pos + 2)))
-                        line_pos = interp_pos + 2
-                        in_interpolation = True
-                    else:
-                        # No backtick or interpolation in this line, just add the rest as string
-                        tokens.append(('string', (line_num, line_pos), (line_num, len(line))))
-                        line_pos = len(line)
+                    # Add the closing backtick
+                    tokens.append(('string', backtick_pos, backtick_pos + 1))
+                    in_template_string = False
+                    line_pos = backtick_pos + 1
+                elif interp_pos != -1:
+                    # Found start of interpolation
+                    if self._non_space.search(line, line_pos, interp_pos):
+                        # Add the string content
+                        tokens.append(('string', line_pos, interp_pos))
+                    
+                    # Add the ${
+                    tokens.append(('operator', interp_pos, interp_pos + 2))
+                    line_pos = interp_pos + 2
+                    in_interpolation = True
+                else:
+                    # No backtick or interpolation in this line, just add the rest as string
+                    if self._non_space.search(line, line_pos):
+                        tokens.append(('string', line_pos, len(line)))
+                    line_pos = len(line)
+            
+            # Handle interpolation content
+            elif in_template_string and in_interpolation:
+                # Look for the end of interpolation; without one it runs to the end of the line
+                brace_pos = line.find('}', line_pos)
+                interpolation_end = brace_pos if brace_pos != -1 else len(line)
                 
-                # Handle interpolation content
-                elif in_template_string and in_interpolation:
-                    # Look for the end of interpolation
-                    brace_pos = line.find('}', line_pos)
+                # Handle any content inside the interpolation normally
+                current_pos = line_pos
+                while True:
+                    match = self._interpolation_master.search(line, current_pos, interpolation_end)
+                    if not match:
+                        break
                     
-                    if brace_pos != -1:
-                        # Handle any content inside the interpolation normally
-                        current_pos = line_pos
-                        while current_pos < brace_pos:
-                            match = None
-                            for pattern, token_type in self.patterns:
-                                if pattern in (r'`', r'\${', r'}'): 
-                                    continue  # Skip template string special patterns
-                                
-                                regex = re.compile(pattern)
-                                match = regex.search(line, current_pos, brace_pos)
-                                if match and match.start() == current_pos:
-                                    tokens.append((token_type, (line_num, match.start()), (line_num, match.end())))
-                                    current_pos = match.end()
-                                    break
-                            
-                            if not match or match.start() != current_pos:
-                                current_pos += 1
-                        
-                        # Add the closing brace
-                        tokens.append(('operator', (line_num, brace_pos), (line_num, brace_pos + 1)))
-                        line_pos = brace_pos + 1
-                        in_interpolation = False
-                    else:
-                        # No closing brace in this line
-                        # Handle any content inside the interpolation normally
-                        current_pos = line_pos
-                        while current_pos < len(line):
-                            match = None
-                            for pattern, token_type in self.patterns:
-                                if pattern in (r'`', r'\${', r'}'): 
-                                    continue  # Skip template string special patterns
-                                
-                                regex = re.compile(pattern)
-                                match = regex.search(line, current_pos)
-                                if match and match.start() == current_pos:
-                                    tokens.append((token_type, (line_num, match.start()), (line_num, match.end())))
-                                    current_pos = match.end()
-                                    break
-                            
-                            if not match or match.start() != current_pos:
-                                current_pos += 1
-                        
-                        line_pos = len(line)
+                    token_end = self._add_token(tokens, match, self._interpolation_group_types, line, interpolation_end)
+                    current_pos = token_end if token_end is not None else match.start() + 1
                 
-                # Normal processing
+                line_pos = interpolation_end
+                if brace_pos != -1:
+                    # Add the closing brace
+                    tokens.append(('operator', brace_pos, brace_pos + 1))
+                    line_pos = brace_pos + 1
+                    in_interpolation = False
+            
+            # Normal processing
+            else:
+                # Jump straight to the next token or backtick
+                match = self._master.search(line, line_pos)
+                if not match:
+                    line_pos = len(line)
+                elif line[match.start()] == '`':
+                    # Backtick starts a template string
+                    tokens.append(('string', match.start(), match.start() + 1))
+                    in_template_string = True
+                    line_pos = match.start() + 1
                 else:
-                    # Check for backtick to start template string
-                    if line[line_pos:line_pos+1] == '`':
-                        tokens.append(('string', (line_num, line_pos), (line_num, line_pos + 1)))
-                        in_template_string = True
-                        line_pos += 1
-                    else:
-                        # Normal token processing
-                        match = None
-                        for pattern, token_type in self.patterns:
-                            regex = re.compile(pattern)
-                            match = regex.search(line, line_pos)
-                            if match and match.start() == line_pos:
-                                tokens.append((token_type, (line_num, match.start()), (line_num, match.end())))
-                                line_pos = match.end()
-                                break
-                        
-                        if not match or match.start() != line_pos:
-                            line_pos += 1
+                    # Normal token processing
+                    token_end = self._add_token(tokens, match, self._group_types, line, len(line))
+                    line_pos = token_end if token_end is not None else match.start() + 1
         
-        return tokens
+        return tokens, (in_template_string, in_interpolation)
 
 
 class HTMLTokenizer(BaseTokenizer):
     """Tokenizer for HTML code"""
-    def __init__(self):
-        # Define regex patterns for HTML tokens
-        self.patterns = [
-            # Comments - must come first
-            (r'<!--[\s\S]*?-->', 'comment'),
-            
-            # Doctype
-            (r'<!DOCTYPE[^>]*>', 'tag'),
-            
-            # Tags (opening)
-            (r'<([a-zA-Z][a-zA-Z0-9_:-]*)', 'tag'),
-            
-            # Tags (closing)
-            (r'</([a-zA-Z][a-zA-Z0-9_:-]*)', 'tag'),
-            
-            # Tag end
-            (r'>', 'tag'),
-            
-            # Self-closing tag end
-            (r'/>', 'tag'),
-            
-            # Attributes - must come before strings
-            (r'\s([a-zA-Z][a-zA-Z0-9_:-]*)\s*=', 'attribute'),
-            
-            # Strings (attribute values)
-            (r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', 'string')
-        ]
+    # Scanner states: in text content, inside a tag, or inside a comment;
+    # tags and comments can span lines
+    TEXT, TAG, COMMENT = 0, 1, 2
+    initial_state = TEXT
+    
+    # Regex patterns for HTML tokens
+    patterns = [
+        # Comments - must come first
+        (r'<!--[\s\S]*?-->', 'comment'),
+        
+        # Doctype
+        (r'<!DOCTYPE[^>]*>', 'tag'),
+        
+        # Tags (opening)
+        (r'<([a-zA-Z][a-zA-Z0-9_:-]*)', 'tag'),
+        
+        # Tags (closing)
+        (r'</([a-zA-Z][a-zA-Z0-9_:-]*)', 'tag'),
         
-    def tokenize(self, text):
-        """Tokenize HTML code with special handling for text content and comments"""
+        # Tag end
+        (r'>', 'tag'),
+        
+        # Self-closing tag end
+        (r'/>', 'tag'),
+        
+        # Attributes - must come before strings
+        (r'\s([a-zA-Z][a-zA-Z0-9_:-]*)\s*=', 'attribute'),
+        
+        # Strings (attribute values)
+        (r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', 'string')
+    ]
+    
+    # Inside a tag, one search finds the next comment start, tag end or tag token
+    _tag_master, _tag_group_types = _combine_patterns(
+        [(r'<!--', 'comment_start'), (r'>', 'tag_end')] +
+        [(pattern, token_type) for pattern, token_type in patterns if token_type != 'comment']
+    )
+    
+    def tokenize_line(self, line, state):
+        """Tokenize a line of HTML code, moving between the text, tag and comment states"""
         tokens = []
-        lines = text.split('\n')
-        
-        # Track HTML parsing state
-        in_tag = False
-        
-        for line_num, line in enumerate(lines, 1):
-            line_pos = 0
-            while line_pos < len(line):
-                # Check for comment start
-                if line_pos < len(line) - 3 and line[line_pos:line_pos+4] == '<!--':
-                    comment_end = line.find('-->', line_pos)
-                    if comment_end != -1:
-                        # Add the entire comment as a single token
-                        tokens.append(('comment', (line_num, line_pos), (line_num, comment_end + 3)))
-                        line_pos = comment_end + 3
-                        continue
-                    else:
-                        # Comment extends to end of line
-                        tokens.append(('comment', (line_num, line_pos), (line_num, len(line))))
-                        line_pos = len(line)
-                        continue
+        
+        # State to return to when a comment ends; comments that span lines end in text
+        resume_state = self.TEXT
+        
+        # Bind the hot loop's lookups to locals once per line
+        tag_search = self._tag_master.search
+        tag_group_types = self._tag_group_types
+        line_len = len(line)
+        
+        line_pos = 0
+        while line_pos < line_len:
+            if state == self.COMMENT:
+                comment_end = line.find('-->', line_pos)
+                if comment_end == -1:
+                    # Comment continues on the next line
+                    tokens.append(('comment', line_pos, line_len))
+                    break
+                
+                # Add the entire comment as a single token
+                tokens.append(('comment', line_pos, comment_end + 3))
+                line_pos = comment_end + 3
+                state = resume_state
+            
+            elif state == self.TEXT:
+                if line.startswith('>', line_pos):
+                    # Stray tag end, e.g. the second ">" of "<b>>"
+                    tokens.append(('tag', line_pos, line_pos + 1))
+                    line_pos += 1
+                    continue
                 
-                # Check for tag start/end to track state
-                if line_pos < len(line) - 1 and line[line_pos:line_pos+2] == '<!':
-                    # Start of doctype
-                    in_tag = True
+                # Text content isn't tokenized, so skip to the next tag or comment
+                line_pos = line.find('<', line_pos)
+                if line_pos == -1:
+                    break
                 
-                elif line_pos < len(line) and line[line_pos] == '<':
-                    # Start of an opening or closing tag
-                    in_tag = True
+                resume_state = state
+                state = self.COMMENT if line.startswith('<!--', line_pos) else self.TAG
+            
+            else:
+                match = tag_search(line, line_pos)
+                if not match:
+                    break
                 
-                elif line_pos < len(line) and line[line_pos] == '>':
-                    # End of tag
-                    tokens.append(('tag', (line_num, line_pos), (line_num, line_pos + 1)))
-                    in_tag = False
-                    line_pos += 1
+                token_type = tag_group_types[match.lastindex]
+                if token_type == 'comment_start':
+                    resume_state = state
+                    state = self.COMMENT
+                    line_pos = match.start()
                     continue
                 
-                # Inside a tag, apply normal token processing
-                if in_tag:
-                    match = None
-                    for pattern, token_type in self.patterns:
-                        if token_type == 'comment':
-                            continue  # Skip comment pattern, already handled
-                        regex = re.compile(pattern)
-                        match = regex.search(line, line_pos)
-                        if match and match.start() == line_pos:
-                            tokens.append((token_type, (line_num, match.start()), (line_num, match.end())))
-                            line_pos = match.end()
-                            break
-                    
-                    if not match or match.start() != line_pos:
-                        line_pos += 1
-                else:
-                    # Not in a tag - find the next tag start
-                    next_tag = line.find('<', line_pos)
-                    if next_tag != -1:
-                        # Skip text content until next tag (don't tokenize it)
-                        line_pos = next_tag
-                    else:
-                        # No more tags in this line
-                        line_pos = len(line)
+                tokens.append(('tag' if token_type == 'tag_end' else token_type, match.start(), match.end()))
+                if token_type == 'tag_end':
+                    state = self.TEXT
+                line_pos = match.end()
         
-        return tokens
+        return tokens, state
 
 class CSSTokenizer(BaseTokenizer):
     """Tokenizer for CSS code"""
-    def __init__(self):
-        # Define regex patterns for CSS tokens
-        self.patterns = [
-            # Comments - must come first
-            (r'\/\*[\s\S]*?\*\/', 'comment'),
-            
-            # Selectors
-            (r'[a-zA-Z0-9_\-\.\#\[\]\:\,\>\+\~\*]+\s*\{', 'tag'),
-            
-            # Properties
-            (r'([a-zA-Z\-]+)\s*:', 'property'),
-            
-            # Values
-            (r':\s*([^;]+);', 'value'),
-            
-            # Colors
-            (r'#[0-9a-fA-F]{3,6}', 'number'),
-            
-            # Units
-            (r'\b\d+\.?\d*(%|px|em|rem|vh|vw|pt|pc|in|cm|mm|ex|ch|vmin|vmax)?\b', 'number'),
-            
-            # Important
-            (r'!important', 'keyword'),
-            
-            # Media queries
-            (r'@media\b', 'keyword'),
-            
-            # Other at-rules
-            (r'@[a-zA-Z\-]+', 'keyword'),
-            
-            # Braces, semicolons, etc.
-            (r'[\{\}\;\:\,]', 'operator')
-        ]
+    # Scanner states: in normal code, or inside a comment that spans lines
+    NORMAL, COMMENT = 0, 1
+    initial_state = NORMAL
     
-    def tokenize(self, text):
-        """Tokenize the input text.
-        Returns a list of (token_type, start_position, end_position) tuples.
+    # Regex patterns for CSS tokens
+    patterns = [
+        # Comments - must come first
+        (r'\/\*[\s\S]*?\*\/', 'comment'),
+        
+        # Start of a comment that continues on the next line
+        (r'\/\*', 'comment_start'),
+        
+        # Selectors
+        (r'[a-zA-Z0-9_\-\.\#\[\]\:\,\>\+\~\*]+\s*\{', 'tag'),
+        
+        # Properties
+        (r'([a-zA-Z\-]+)\s*:', 'property'),
+        
+        # Values
+        (r':\s*([^;]+);', 'value'),
+        
+        # Colors
+        (r'#[0-9a-fA-F]{3,6}', 'number'),
+        
+        # Units
+        (r'\b\d+\.?\d*(%|px|em|rem|vh|vw|pt|pc|in|cm|mm|ex|ch|vmin|vmax)?\b', 'number'),
+        
+        # Important
+        (r'!important', 'keyword'),
+        
+        # Media queries
+        (r'@media\b', 'keyword'),
+        
+        # Other at-rules
+        (r'@[a-zA-Z\-]+', 'keyword'),
+        
+        # Braces, semicolons, etc.
+        (r'[\{\}\;\:\,]', 'operator')
+    ]
+    _master, _group_types = _combine_patterns(patterns)
+    
+    def tokenize_line(self, line, state):
+        """Tokenize a single line.
+        Returns a list of (token_type, start_column, end_column) tuples and the end-of-line state.
         """
+        group_types = self._group_types
         tokens = []
-        lines = text.split('\n')
-        
-        # Track state for multi-line constructs
-        in_string = False
-        in_comment = False
-        string_start = (0, 0)
-        comment_start = (0, 0)
-        
-        for line_num, line in enumerate(lines, 1):
-            line_pos = 0
-            while line_pos < len(line):
-                # If we're not in a special state, look for tokens
-                if not in_string and not in_comment:
-                    match = None
-                    for pattern, token_type in self.patterns:
-                        regex = re.compile(pattern)
-                        match = regex.search(line, line_pos)
-                        if match and match.start() == line_pos:
-                            # Found a token
-                            start_pos = (line_num, match.start())
-                            end_pos = (line_num, match.end())
-                            tokens.append((token_type, start_pos, end_pos))
-                            line_pos = match.end()
-                            break
-                    
-                    # If no token found, move to the next character
-                    if not match or match.start() != line_pos:
-                        line_pos += 1
-                else:
-                    # We're in a string or comment, just move to the next character
-                    line_pos += 1
+        line_pos = 0
+        if state == self.COMMENT:
+            # Continue the comment from the previous line
+            comment_end = line.find('*/')
+            if comment_end == -1:
+                if line:
+                    tokens.append(('comment', 0, len(line)))
+                return tokens, state
+            
+            tokens.append(('comment', 0, comment_end + 2))
+            line_pos = comment_end + 2
+        
+        for match in self._master.finditer(line, line_pos):
+            token_type = group_types[match.lastindex]
+            if token_type == 'comment_start':
+                tokens.append(('comment', match.start(), len(line)))
+                return tokens, self.COMMENT
+            tokens.append((token_type, match.start(), match.end()))
         
-        return tokens
\ No newline at end of file
+        return tokens, self.NORMAL
\ No newline at end of file